@@ -18,21 +18,37 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin, GroupAdmin
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
+from django.contrib.auth.models import Group
+from django.db.models import Prefetch
+
+from social_core.utils import setting_name
+from social_django.admin import UserSocialAuthOption
 
 from weblate.accounts.forms import UniqueEmailMixin
 
+# User columns needed to render WeblateUserAdmin.list_display
+USER_LIST_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'is_staff',
+    'is_active',
+)
+
 
 class ProfileAdmin(admin.ModelAdmin):
     list_display = [
         'user', 'full_name', 'language', 'suggested', 'translated'
     ]
+    # Prefix lookups only, substring search would require trigram
+    # (pg_trgm) indexes on upper(username) and upper(email)
     search_fields = [
-        'user__username', 'user__email', 'user__first_name'
+        '^user__username', '^user__email'
     ]
     list_filter = ['language']
+    list_select_related = ('user',)
 
 
 class VerifiedEmailAdmin(admin.ModelAdmin):
@@ -41,6 +57,26 @@ class VerifiedEmailAdmin(admin.ModelAdmin):
         'email', 'social__user__username', 'social__user__email'
     )
     raw_id_fields = ('social',)
+    list_select_related = ('social', 'social__user')
+
+
+class WeblateUserSocialAuthAdmin(UserSocialAuthOption):
+    """Social auth admin with prefix search.
+
+    Its changelist is the popup for choosing social auth in
+    VerifiedEmailAdmin.
+    """
+    search_fields = ('^user__username', '^user__email', '^uid')
+
+    def get_search_fields(self, request=None):
+        # Configured user search fields can not be prefixed with ^
+        if getattr(settings, setting_name('ADMIN_USER_SEARCH_FIELDS'), None):
+            return super(WeblateUserSocialAuthAdmin, self).get_search_fields(
+                request
+            )
+        return list(self.search_fields) + list(
+            getattr(settings, setting_name('ADMIN_SEARCH_FIELDS'), [])
+        )
 
 
 class WeblateUserChangeForm(UserChangeForm):
@@ -60,12 +96,22 @@ class WeblateUserCreationForm(UserCreationForm, UniqueEmailMixin):
         self.fields['email'].required = True
 
 
+class WeblateUserChangeList(ChangeList):
+    """User listing fetching only displayed columns."""
+    def get_queryset(self, request):
+        return super(WeblateUserChangeList, self).get_queryset(
+            request
+        ).only(*USER_LIST_FIELDS)
+
+
 class WeblateUserAdmin(UserAdmin):
     """Custom UserAdmin class.
 
     Used to add listing of group membership and whether user is active.
     """
     list_display = UserAdmin.list_display + ('is_active', 'user_groups', 'id')
+    # Prefix lookups only, see ProfileAdmin
+    search_fields = ('^username', '^email')
     form = WeblateUserChangeForm
     add_form = WeblateUserCreationForm
     add_fieldsets = (
@@ -75,8 +121,22 @@ class WeblateUserAdmin(UserAdmin):
         }),
     )
 
+    def get_changelist(self, request, **kwargs):
+        return WeblateUserChangeList
+
+    def get_queryset(self, request):
+        return super(WeblateUserAdmin, self).get_queryset(
+            request
+        ).prefetch_related(
+            Prefetch('groups', queryset=Group.objects.only('name'))
+        )
+
     def user_groups(self, obj):
-        """Display comma separated list of user groups."""
+        """Display comma separated list of user groups.
+
+        Uses prefetched groups, filtering the relation here would
+        query database for every listed user.
+        """
         return ','.join([g.name for g in obj.groups.all()])
 
 
@@ -106,7 +106,10 @@ def get_fallback_avatar(size):
 
 
 def get_avatar_image(request, user, size):
-    """Return avatar image from cache (if available) or download it."""
+    """Return avatar image from cache (if available) or download it.
+
+    Returns None if the image could not be downloaded.
+    """
 
     cache_key = '-'.join((
         'avatar-img',
@@ -136,7 +139,7 @@ def get_avatar_image(request, user, size):
                 user.username,
                 str(error)
             )
-            return get_fallback_avatar(size)
+            return None
 
     return image
 
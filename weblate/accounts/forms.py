@@ -50,12 +50,12 @@ class UniqueEmailMixin(object):
         """Validate that the supplied email address is unique for the site. """
         self.cleaned_data['email_user'] = None
         mail = self.cleaned_data['email']
-        users = User.objects.filter(
+        user = User.objects.filter(
             Q(social_auth__verifiedemail__email__iexact=mail) |
             Q(email__iexact=mail)
-        )
-        if users.exists():
-            self.cleaned_data['email_user'] = users[0]
+        ).first()
+        if user is not None:
+            self.cleaned_data['email_user'] = user
             if self.validate_unique_mail:
                 raise forms.ValidationError(
                     _(
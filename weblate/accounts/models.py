@@ -177,7 +177,8 @@ class Profile(models.Model):
         verbose_name=_('Interface Language'),
         max_length=10,
         blank=True,
-        choices=settings.LANGUAGES
+        choices=settings.LANGUAGES,
+        db_index=True,
     )
     languages = models.ManyToManyField(
         Language,
@@ -23,6 +23,7 @@ Tests for user handling.
 """
 
 from io import BytesIO
+import hashlib
 from unittest import SkipTest
 
 from django.core.urlresolvers import reverse
@@ -98,6 +99,20 @@ class AvatarTest(ViewTestCase):
         )
         self.assert_png(response)
         self.assertEqual(response.content, imagedata)
+        # ETag is derived from the image, not from the email
+        self.assertEqual(
+            response['ETag'],
+            '"{0}"'.format(hashlib.md5(imagedata).hexdigest())
+        )
+        # Test conditional request
+        response = self.client.get(
+            reverse(
+                'user_avatar',
+                kwargs={'user': self.user.username, 'size': 32}
+            ),
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
 
     @httpretty.activate
     def test_avatar_error(self):
@@ -116,6 +131,11 @@ class AvatarTest(ViewTestCase):
             )
         )
         self.assert_png(response)
+        self.assertEqual(
+            response.content, avatar.get_fallback_avatar(32)
+        )
+        # Fallback image can not be revalidated
+        self.assertFalse(response.has_header('ETag'))
 
     def test_anonymous_avatar(self):
         anonymous = User.objects.get(username='anonymous')
@@ -130,6 +150,7 @@ class AvatarTest(ViewTestCase):
             response, '/static/weblate-32.png',
             fetch_redirect_response=False
         )
+        self.assertFalse(response.has_header('ETag'))
 
     def test_fallback_avatar(self):
         self.assert_png_data(
@@ -21,16 +21,30 @@
 """Test for user handling."""
 
 from django.test import TestCase
-from django.test.utils import override_settings
+from django.test.utils import override_settings, CaptureQueriesContext
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import User
 from django.core import mail
+from django.core.cache import cache
+from django.db import connection
 
 from weblate.accounts.models import Profile
 
 from weblate.trans.tests.test_views import ViewTestCase
 from weblate.lang.models import Language
 
+# Fast hasher, none of the tests here check password hashing
+TEST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+API_KEY_URL = reverse('reset-api-key')
+CONTACT_URL = reverse('contact')
+HOME_URL = reverse('home')
+HOSTING_URL = reverse('hosting')
+LOGIN_URL = reverse('login')
+LOGOUT_URL = reverse('logout')
+PASSWORD_URL = reverse('password')
+PROFILE_URL = reverse('profile')
+
 CONTACT_DATA = {
     'name': 'Test',
     'email': 'noreply@weblate.org',
@@ -38,30 +52,29 @@ CONTACT_DATA = {
     'message': 'Hi\n\nThis app looks really cool!',
 }
 
+HOSTING_DATA = {
+    'name': 'Test',
+    'email': 'noreply@weblate.org',
+    'project': 'HOST',
+    'url': 'http://example.net',
+    'repo': 'https://github.com/WeblateOrg/weblate.git',
+    'mask': 'po/*.po',
+    'message': 'Hi\n\nI want to use it!',
+}
 
-class ViewTest(TestCase):
-    """Test for views."""
 
-    def get_user(self):
-        user = User.objects.create_user(
-            username='testuser',
-            password='testpassword'
-        )
-        user.first_name = 'First Second'
-        user.email = 'noreply@weblate.org'
-        user.save()
-        Profile.objects.get_or_create(user=user)
-        return user
+class ContactViewTest(TestCase):
+    """Test for contact form without logged in user."""
 
     def test_contact(self):
         """Test for contact form."""
         # Basic get
-        response = self.client.get(reverse('contact'))
+        response = self.client.get(CONTACT_URL)
         self.assertContains(response, 'id="id_message"')
 
         # Sending message
-        response = self.client.post(reverse('contact'), CONTACT_DATA)
-        self.assertRedirects(response, reverse('home'))
+        response = self.client.post(CONTACT_URL, CONTACT_DATA)
+        self.assertRedirects(response, HOME_URL)
 
         # Verify message
         self.assertEqual(len(mail.outbox), 1)
@@ -75,42 +88,51 @@ class ViewTest(TestCase):
     )
     def test_contact_rate(self):
         """Test for contact form rate limiting."""
-        response = self.client.post(reverse('contact'), CONTACT_DATA)
+        response = self.client.post(CONTACT_URL, CONTACT_DATA)
         self.assertContains(
             response,
             'Too many messages sent, please try again later!'
         )
 
+    def test_contact_subject(self):
+        # With set subject
+        response = self.client.get(
+            CONTACT_URL,
+            {'t': 'reg'}
+        )
+        self.assertContains(response, 'Registration problems')
+
+
+@override_settings(PASSWORD_HASHERS=TEST_PASSWORD_HASHERS)
+class ViewTest(TestCase):
+    """Test for views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword',
+            email='noreply@weblate.org',
+            first_name='First Second',
+        )
+
     @override_settings(OFFER_HOSTING=False)
     def test_hosting_disabled(self):
         """Test for hosting form with disabled hosting"""
-        self.get_user()
-        self.client.login(username='testuser', password='testpassword')
-        response = self.client.get(reverse('hosting'))
-        self.assertRedirects(response, reverse('home'))
+        self.client.force_login(self.user)
+        response = self.client.get(HOSTING_URL)
+        self.assertRedirects(response, HOME_URL)
 
     @override_settings(OFFER_HOSTING=True)
     def test_hosting(self):
         """Test for hosting form with enabled hosting."""
-        self.get_user()
-        self.client.login(username='testuser', password='testpassword')
-        response = self.client.get(reverse('hosting'))
+        self.client.force_login(self.user)
+        response = self.client.get(HOSTING_URL)
         self.assertContains(response, 'id="id_message"')
 
         # Sending message
-        response = self.client.post(
-            reverse('hosting'),
-            {
-                'name': 'Test',
-                'email': 'noreply@weblate.org',
-                'project': 'HOST',
-                'url': 'http://example.net',
-                'repo': 'https://github.com/WeblateOrg/weblate.git',
-                'mask': 'po/*.po',
-                'message': 'Hi\n\nI want to use it!',
-            }
-        )
-        self.assertRedirects(response, reverse('home'))
+        response = self.client.post(HOSTING_URL, HOSTING_DATA)
+        self.assertRedirects(response, HOME_URL)
 
         # Verify message
         self.assertEqual(len(mail.outbox), 1)
@@ -123,87 +145,84 @@ class ViewTest(TestCase):
             mail.outbox[0].body,
         )
 
-    def test_contact_subject(self):
-        # With set subject
-        response = self.client.get(
-            reverse('contact'),
-            {'t': 'reg'}
-        )
-        self.assertContains(response, 'Registration problems')
-
     def test_contact_user(self):
-        self.get_user()
         # Login
-        self.client.login(username='testuser', password='testpassword')
+        self.client.force_login(self.user)
         response = self.client.get(
-            reverse('contact'),
+            CONTACT_URL,
         )
         self.assertContains(response, 'value="First Second"')
         self.assertContains(response, 'noreply@weblate.org')
 
     def test_user(self):
         """Test user pages."""
-        # Setup user
-        user = self.get_user()
-
         # Login as user
-        self.client.login(username='testuser', password='testpassword')
+        self.client.force_login(self.user)
 
         # Get public profile
         response = self.client.get(
-            reverse('user_page', kwargs={'user': user.username})
+            reverse('user_page', kwargs={'user': self.user.username})
         )
         self.assertContains(response, '="/activity/')
 
     def test_login(self):
-        self.get_user()
-
         # Login
         response = self.client.post(
-            reverse('login'),
+            LOGIN_URL,
             {'username': 'testuser', 'password': 'testpassword'}
         )
-        self.assertRedirects(response, reverse('home'))
+        self.assertRedirects(response, HOME_URL)
 
         # Login redirect
-        response = self.client.get(reverse('login'))
-        self.assertRedirects(response, reverse('profile'))
+        response = self.client.get(LOGIN_URL)
+        self.assertRedirects(response, PROFILE_URL)
 
         # Logout with GET should fail
-        response = self.client.get(reverse('logout'))
+        response = self.client.get(LOGOUT_URL)
         self.assertEqual(response.status_code, 405)
 
         # Logout
-        response = self.client.post(reverse('logout'))
-        self.assertRedirects(response, reverse('home'))
+        response = self.client.post(LOGOUT_URL)
+        self.assertRedirects(response, HOME_URL)
 
     def test_password(self):
-        # Create user
-        self.get_user()
         # Login
-        self.client.login(username='testuser', password='testpassword')
+        self.client.force_login(self.user)
         # Change without data
         response = self.client.post(
-            reverse('password')
+            PASSWORD_URL
         )
         self.assertContains(response, 'This field is required.')
         response = self.client.get(
-            reverse('password'),
+            PASSWORD_URL,
         )
         self.assertContains(response, 'Current password')
-        # Change with wrong password
+        # Change to invalid password does not check current one
         response = self.client.post(
-            reverse('password'),
+            PASSWORD_URL,
             {
                 'password': '123456',
                 'new_password1': '123456',
                 'new_password2': '123456'
             }
         )
+        self.assertContains(response, 'This password is entirely numeric.')
+        self.assertNotContains(
+            response, 'You have entered an invalid password.'
+        )
+        # Change with wrong password
+        response = self.client.post(
+            PASSWORD_URL,
+            {
+                'password': '123456',
+                'new_password1': '1pa$$word!',
+                'new_password2': '1pa$$word!'
+            }
+        )
         self.assertContains(response, 'You have entered an invalid password.')
         # Change
         response = self.client.post(
-            reverse('password'),
+            PASSWORD_URL,
             {
                 'password': 'testpassword',
                 'new_password1': '1pa$$word!',
@@ -211,44 +230,169 @@ class ViewTest(TestCase):
             }
         )
 
-        self.assertRedirects(response, reverse('profile') + '#auth')
+        self.assertRedirects(response, PROFILE_URL + '#auth')
         self.assertTrue(
             User.objects.get(username='testuser').check_password('1pa$$word!')
         )
 
+    @override_settings(AUTH_MAX_ATTEMPTS=2)
+    def test_password_attempts(self):
+        self.addCleanup(
+            cache.delete, 'password-attempts-{0}'.format(self.user.pk)
+        )
+        self.client.force_login(self.user)
+        data = {
+            'password': 'wrong',
+            'new_password1': '1pa$$word!',
+            'new_password2': '1pa$$word!'
+        }
+        for dummy in range(2):
+            response = self.client.post(PASSWORD_URL, data)
+            self.assertContains(
+                response, 'You have entered an invalid password.'
+            )
+        response = self.client.post(PASSWORD_URL, data)
+        self.assertRedirects(response, LOGIN_URL)
+
+    @override_settings(DEMO_SERVER=True)
+    def test_demo(self):
+        user = User.objects.create_user(
+            username='demo',
+            password='demo',
+            email='demo@example.com',
+        )
+        self.client.force_login(user)
+        response = self.client.get(PROFILE_URL)
+        self.assertContains(response, 'action="/accounts/profile/"')
+        for url in PROFILE_URL, PASSWORD_URL, reverse('remove'):
+            response = self.client.post(url, follow=True)
+            self.assertRedirects(response, PROFILE_URL)
+            self.assertContains(
+                response,
+                'You cannot change demo account on the demo server.'
+            )
+
     def test_api_key(self):
-        # Create user
-        self.get_user()
         # Login
-        self.client.login(username='testuser', password='testpassword')
+        self.client.force_login(self.user)
 
         # API key reset with GET should fail
-        response = self.client.get(reverse('reset-api-key'))
+        response = self.client.get(API_KEY_URL)
         self.assertEqual(response.status_code, 405)
 
         # API key reset
-        response = self.client.post(reverse('reset-api-key'))
-        self.assertRedirects(response, reverse('profile') + '#api')
+        key = self.user.auth_token.key
+        response = self.client.post(API_KEY_URL)
+        self.assertRedirects(response, PROFILE_URL + '#api')
+        new_key = User.objects.get(pk=self.user.pk).auth_token.key
+        self.assertNotEqual(key, new_key)
+        self.assertEqual(len(new_key), 40)
 
 
+@override_settings(PASSWORD_HASHERS=TEST_PASSWORD_HASHERS)
 class ProfileTest(ViewTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs_lang_id = Language.objects.get(code='cs').id
+
     def test_profile(self):
         # Get profile page
-        response = self.client.get(reverse('profile'))
+        response = self.client.get(PROFILE_URL)
         self.assertContains(response, 'action="/accounts/profile/"')
         self.assertContains(response, 'name="secondary_languages"')
 
         # Save profile
         response = self.client.post(
-            reverse('profile'),
+            PROFILE_URL,
             {
                 'language': 'cs',
-                'languages': Language.objects.get(code='cs').id,
-                'secondary_languages': Language.objects.get(code='cs').id,
+                'languages': self.cs_lang_id,
+                'secondary_languages': self.cs_lang_id,
                 'first_name': 'First Last',
                 'email': 'noreply@weblate.org',
                 'username': 'testik',
                 'dashboard_view': Profile.DASHBOARD_WATCHED,
             }
         )
-        self.assertRedirects(response, reverse('profile'))
+        self.assertRedirects(response, PROFILE_URL)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.username, 'testik')
+        self.assertEqual(user.first_name, 'First Last')
+        self.assertEqual(user.profile.language, 'cs')
+        self.assertEqual(
+            user.profile.dashboard_view, Profile.DASHBOARD_WATCHED
+        )
+        self.assertEqual(
+            [lang.pk for lang in user.profile.secondary_languages.all()],
+            [self.cs_lang_id]
+        )
+
+    def test_user_page(self):
+        # Make some activity
+        self.edit_unit('Hello, world!\n', 'Nazdar svete!\n')
+
+        response = self.client.get(
+            reverse('user_page', kwargs={'user': self.user.username})
+        )
+        self.assertContains(
+            response,
+            'class="list-group-item" href="{0}"'.format(
+                self.project.get_absolute_url()
+            )
+        )
+        self.assertContains(response, 'Nazdar svete!')
+
+    def test_profile_licenses(self):
+        self.subproject.license = 'WTFPL'
+        self.subproject.license_url = 'http://www.wtfpl.net/'
+        self.subproject.save()
+
+        response = self.client.get(PROFILE_URL)
+        self.assertContains(response, self.subproject.get_absolute_url())
+        self.assertContains(
+            response,
+            '<a href="http://www.wtfpl.net/">WTFPL</a>'
+        )
+
+    def test_user_suggestions(self):
+        self.edit_unit('Hello, world!\n', 'Nazdar svete!\n', suggest='yes')
+
+        response = self.client.get(
+            reverse('user_suggestions', kwargs={'user': self.user.username})
+        )
+        self.assertContains(response, 'Nazdar svete!')
+        self.assertContains(response, self.user.profile.get_user_name())
+
+    def test_profile_managed(self):
+        self.project.add_user(self.user, '@Administration')
+
+        response = self.client.get(PROFILE_URL)
+        self.assertContains(response, 'Managed projects')
+        self.assertContains(response, self.project.get_absolute_url())
+
+    def test_profile_associated(self):
+        self.user.social_auth.all().delete()
+        self.user.social_auth.create(provider='email', uid='one@example.com')
+        response = self.client.get(PROFILE_URL)
+        self.assertContains(response, 'one@example.com')
+        self.assertNotContains(response, 'class="disconnect')
+
+        self.user.social_auth.create(provider='email', uid='two@example.com')
+        response = self.client.get(PROFILE_URL)
+        self.assertContains(response, 'two@example.com')
+        self.assertContains(response, 'class="disconnect', count=2)
+
+    def test_profile_associated_queries(self):
+        self.user.social_auth.all().delete()
+        self.user.social_auth.create(provider='email', uid='one@example.com')
+        # First request stores default profile language
+        self.client.get(PROFILE_URL)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(PROFILE_URL)
+        expected = len(context)
+
+        self.user.social_auth.create(provider='email', uid='two@example.com')
+        self.user.social_auth.create(provider='email', uid='three@example.com')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(PROFILE_URL)
+        self.assertEqual(len(context), expected)
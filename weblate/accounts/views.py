@@ -20,22 +20,26 @@
 
 from __future__ import unicode_literals
 
+from functools import wraps
+import hashlib
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.http import HttpResponse, HttpResponseRedirect
 from django.contrib.auth import logout
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.middleware.csrf import rotate_token
 from django.utils.translation import ugettext as _
 from django.contrib.auth.decorators import login_required
 from django.core.mail.message import EmailMultiAlternatives
 from django.utils import translation
 from django.utils.cache import patch_response_headers
-from django.utils.crypto import get_random_string
 from django.utils.translation import get_language
 from django.contrib.auth.models import User
 from django.contrib.auth import views as auth_views
 from django.views.generic import TemplateView, ListView
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, condition
 from django.contrib.auth import update_session_auth_hash
 from django.core.urlresolvers import reverse
 from django.utils.http import urlencode
@@ -52,7 +56,9 @@ from weblate.accounts.forms import (
 )
 from weblate.accounts.ratelimit import check_rate_limit
 from weblate.logger import LOGGER
-from weblate.accounts.avatar import get_avatar_image, get_fallback_avatar_url
+from weblate.accounts.avatar import (
+    get_avatar_image, get_fallback_avatar, get_fallback_avatar_url,
+)
 from weblate.accounts.models import set_lang, remove_user, Profile
 from weblate.utils import messages
 from weblate.trans.models import Change, Project, SubProject, Suggestion
@@ -64,23 +70,23 @@ from weblate.accounts.forms import (
 from weblate.accounts.notifications import notify_account_activity
 
 CONTACT_TEMPLATE = '''
-Message from %(name)s <%(email)s>:
+Message from {name} <{email}>:
 
-%(message)s
+{message}
 '''
 
 HOSTING_TEMPLATE = '''
-%(name)s <%(email)s> wants to host %(project)s
+{name} <{email}> wants to host {project}
 
-Project:    %(project)s
-Website:    %(url)s
-Repository: %(repo)s
-Filemask:   %(mask)s
-Username:   %(username)s
+Project:    {project}
+Website:    {url}
+Repository: {repo}
+Filemask:   {mask}
+Username:   {username}
 
 Additional message:
 
-%(message)s
+{message}
 '''
 
 CONTACT_SUBJECTS = {
@@ -90,6 +96,37 @@ CONTACT_SUBJECTS = {
     'account': 'Suspicious account activity',
 }
 
+# Email authentication backend, as a set for set operations
+EMAIL_BACKENDS = frozenset(('email',))
+
+# Cache of configured authentication backend names, all and non email
+AUTH_BACKENDS_CACHE = {}
+
+
+def get_backend_names():
+    """Return tuples of names of all and non email authentication backends.
+
+    Both are stored with single assignment so that concurrent callers
+    never see one without the other.
+    """
+    if 'names' not in AUTH_BACKENDS_CACHE:
+        names = tuple(load_backends(BACKENDS).keys())
+        AUTH_BACKENDS_CACHE['names'] = (
+            names,
+            tuple(x for x in names if x not in EMAIL_BACKENDS),
+        )
+    return AUTH_BACKENDS_CACHE['names']
+
+
+def get_auth_backends():
+    """Return tuple of names of configured authentication backends."""
+    return get_backend_names()[0]
+
+
+def get_login_backends():
+    """Return tuple of names of configured non email backends."""
+    return get_backend_names()[1]
+
 
 class RegistrationTemplateView(TemplateView):
     """Class for rendering registration pages."""
@@ -135,8 +172,11 @@ def mail_admins_contact(request, subject, message, context, sender):
         return
 
     mail = EmailMultiAlternatives(
-        '{0}{1}'.format(settings.EMAIL_SUBJECT_PREFIX, subject % context),
-        message % context,
+        '{0}{1}'.format(
+            settings.EMAIL_SUBJECT_PREFIX,
+            subject.format(**context)
+        ),
+        message.format(**context),
         to=[a[1] for a in settings.ADMINS],
         headers={'Reply-To': sender},
     )
@@ -158,6 +198,21 @@ def deny_demo(request):
     return redirect_profile(request.POST.get('activetab'))
 
 
+def is_demo_user(request):
+    """Check whether request is made by demo account on demo server."""
+    return settings.DEMO_SERVER and request.user.username == 'demo'
+
+
+def deny_demo_user(view):
+    """Decorator denying access to the view for demo account."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if is_demo_user(request):
+            return deny_demo(request)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
 def redirect_profile(page=''):
     url = reverse('profile')
     if page and page.startswith('#'):
@@ -183,17 +238,22 @@ def user_profile(request):
     ]
 
     if request.method == 'POST':
+        if is_demo_user(request):
+            return deny_demo(request)
+
         # Parse POST params
         forms = [form(request.POST, instance=profile) for form in form_classes]
         forms.append(UserForm(request.POST, instance=request.user))
 
-        if settings.DEMO_SERVER and request.user.username == 'demo':
-            return deny_demo(request)
-
         if all(form.is_valid() for form in forms):
-            # Save changes
-            for form in forms:
-                form.save()
+            # Save changes, the profile forms share single instance
+            with transaction.atomic():
+                for form in forms:
+                    form.save(commit=False)
+                profile.save()
+                request.user.save()
+                for form in forms:
+                    form.save_m2m()
 
             # Change language
             set_lang(request, request.user.profile)
@@ -204,7 +264,8 @@ def user_profile(request):
             # Set language cookie and activate new language (for message below)
             lang_code = profile.language
             response.set_cookie(settings.LANGUAGE_COOKIE_NAME, lang_code)
-            translation.activate(lang_code)
+            if translation.get_language() != lang_code:
+                translation.activate(lang_code)
 
             messages.success(request, _('Your profile has been updated.'))
 
@@ -213,17 +274,22 @@ def user_profile(request):
         forms = [form(instance=profile) for form in form_classes]
         forms.append(UserForm(instance=request.user))
 
-    social = request.user.social_auth.all()
-    social_names = [assoc.provider for assoc in social]
-    all_backends = set(load_backends(BACKENDS).keys())
-    new_backends = [
-        x for x in all_backends
-        if x == 'email' or x not in social_names
-    ]
+    # User is needed as well, the related manager sets it on each row
+    social = list(request.user.social_auth.only('provider', 'uid', 'user'))
+    social_names = {assoc.provider for assoc in social}
+    all_backends = set(get_auth_backends())
+    new_backends = list(
+        (all_backends - social_names) | (all_backends & EMAIL_BACKENDS)
+    )
     license_projects = SubProject.objects.filter(
-        project__in=Project.objects.all_acl(request.user)
+        project_id__in=Project.objects.get_acl_ids(request.user)
     ).exclude(
         license=''
+    ).select_related(
+        'project'
+    ).only(
+        'name', 'slug', 'license', 'license_url',
+        'project', 'project__name', 'project__slug',
     )
 
     result = render(
@@ -244,6 +310,8 @@ def user_profile(request):
             'managed_projects': Project.objects.filter(
                 groupacl__groups__name__endswith='@Administration',
                 groupacl__groups__user=request.user,
+            ).only(
+                'name', 'slug'
             ).distinct(),
         }
     )
@@ -255,10 +323,8 @@ def user_profile(request):
 
 
 @login_required
+@deny_demo_user
 def user_remove(request):
-    if settings.DEMO_SERVER and request.user.username == 'demo':
-        return deny_demo(request)
-
     if request.method == 'POST':
         remove_user(request.user)
 
@@ -297,7 +363,7 @@ def contact(request):
         elif form.is_valid():
             mail_admins_contact(
                 request,
-                '%(subject)s',
+                '{subject}',
                 CONTACT_TEMPLATE,
                 form.cleaned_data,
                 form.cleaned_data['email'],
@@ -305,8 +371,9 @@ def contact(request):
             return redirect('home')
     else:
         initial = get_initial_contact(request)
-        if request.GET.get('t') in CONTACT_SUBJECTS:
-            initial['subject'] = CONTACT_SUBJECTS[request.GET['t']]
+        subject = CONTACT_SUBJECTS.get(request.GET.get('t'))
+        if subject is not None:
+            initial['subject'] = subject
         form = ContactForm(initial=initial)
 
     return render(
@@ -332,7 +399,7 @@ def hosting(request):
             context['username'] = request.user.username
             mail_admins_contact(
                 request,
-                'Hosting request for %(project)s',
+                'Hosting request for {project}',
                 HOSTING_TEMPLATE,
                 context,
                 form.cleaned_data['email'],
@@ -354,8 +421,14 @@ def hosting(request):
 
 def user_page(request, user):
     """User details page."""
-    user = get_object_or_404(User, username=user)
-    profile = Profile.objects.get_or_create(user=user)[0]
+    user = get_object_or_404(
+        User.objects.select_related('profile'),
+        username=user
+    )
+    try:
+        profile = user.profile
+    except Profile.DoesNotExist:
+        profile = Profile.objects.create(user=user)
 
     # Filter all user activity
     all_changes = Change.objects.last_changes(request.user).filter(
@@ -366,10 +439,9 @@ def user_page(request, user):
     last_changes = all_changes[:10]
 
     # Filter where project is active
-    user_projects_ids = set(all_changes.values_list(
-        'translation__subproject__project', flat=True
-    ))
-    user_projects = Project.objects.filter(id__in=user_projects_ids)
+    user_projects = Project.objects.filter(
+        id__in=all_changes.values('translation__subproject__project')
+    )
 
     return render(
         request,
@@ -386,16 +458,50 @@ def user_page(request, user):
     )
 
 
+def get_avatar_data(request, user, size):
+    """Return user and avatar image, None if it is not available.
+
+    The result is kept on the request to be shared by the ETag function
+    and the view.
+    """
+    if not hasattr(request, 'avatar_data'):
+        user = get_object_or_404(
+            User.objects.only('username', 'email'),
+            username=user
+        )
+        image = None
+        if user.email != 'noreply@weblate.org':
+            image = get_avatar_image(request, user, size)
+        request.avatar_data = (user, image)
+    return request.avatar_data
+
+
+def get_avatar_etag(request, user, size):
+    """Return ETag for served avatar image.
+
+    There is none for the fallback image, so that clients fetch the
+    real one once it can be downloaded.
+    """
+    image = get_avatar_data(request, user, size)[1]
+    if image is None:
+        return None
+    return hashlib.md5(image).hexdigest()
+
+
+@condition(etag_func=get_avatar_etag)
 def user_avatar(request, user, size):
     """User avatar view."""
-    user = get_object_or_404(User, username=user)
+    user, image = get_avatar_data(request, user, size)
 
     if user.email == 'noreply@weblate.org':
         return redirect(get_fallback_avatar_url(size))
 
+    if image is None:
+        image = get_fallback_avatar(size)
+
     response = HttpResponse(
         content_type='image/png',
-        content=get_avatar_image(request, user, size)
+        content=image
     )
 
     patch_response_headers(response, 3600 * 24 * 7)
@@ -411,18 +517,17 @@ def weblate_login(request):
         return redirect_profile()
 
     # Redirect if there is only one backend
-    auth_backends = list(load_backends(BACKENDS).keys())
-    if len(auth_backends) == 1 and auth_backends[0] != 'email':
-        return redirect('social:begin', auth_backends[0])
+    auth_backends = get_auth_backends()
+    login_backends = get_login_backends()
+    if len(auth_backends) == 1 and login_backends:
+        return redirect('social:begin', login_backends[0])
 
     return auth_views.login(
         request,
         template_name='accounts/login.html',
         authentication_form=LoginForm,
         extra_context={
-            'login_backends': [
-                x for x in auth_backends if x != 'email'
-            ],
+            'login_backends': login_backends,
             'can_reset': 'email' in auth_backends,
             'title': _('Login'),
         }
@@ -465,7 +570,7 @@ def register(request):
         if settings.REGISTRATION_CAPTCHA:
             captcha_form = CaptchaForm(request)
 
-    backends = set(load_backends(BACKENDS).keys())
+    backends = set(get_auth_backends())
 
     # Redirect if there is only one backend
     if len(backends) == 1 and 'email' not in backends:
@@ -476,7 +581,7 @@ def register(request):
         'accounts/register.html',
         {
             'registration_email': 'email' in backends,
-            'registration_backends': backends - set(['email']),
+            'registration_backends': backends - EMAIL_BACKENDS,
             'title': _('User registration'),
             'form': form,
             'captcha_form': captcha_form,
@@ -520,48 +625,57 @@ def email_login(request):
     )
 
 
+def get_password_attempts_key(request):
+    """Return cache key for counting failed password checks."""
+    return 'password-attempts-{0}'.format(request.user.pk)
+
+
+def check_current_password(request, change_form):
+    """Verify current password, counting failed attempts."""
+    if not change_form.is_valid():
+        return False
+    key = get_password_attempts_key(request)
+    if request.user.check_password(change_form.cleaned_data['password']):
+        cache.delete(key)
+        return True
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No such key, so set it
+        cache.set(key, 1, settings.AUTH_CHECK_WINDOW)
+    messages.error(
+        request,
+        _('You have entered an invalid password.')
+    )
+    rotate_token(request)
+    return False
+
+
 @login_required
+@deny_demo_user
 def password(request):
     """Password change / set form."""
-    if settings.DEMO_SERVER and request.user.username == 'demo':
-        return deny_demo(request)
-
-    do_change = False
+    has_password = request.user.has_usable_password()
 
-    attempts = request.session.get('auth_attempts', 0)
-
-    if not request.user.has_usable_password():
-        do_change = True
-        change_form = None
-    elif request.method == 'POST':
-        if attempts >= settings.AUTH_MAX_ATTEMPTS:
+    if request.method == 'POST':
+        attempts = cache.get(get_password_attempts_key(request)) or 0
+        if has_password and attempts >= settings.AUTH_MAX_ATTEMPTS:
             logout(request)
             messages.error(
                 request,
                 _('Too many authentication attempts!')
             )
             return redirect('login')
-        else:
-            change_form = PasswordChangeForm(request.POST)
-            if change_form.is_valid():
-                cur_password = change_form.cleaned_data['password']
-                do_change = request.user.check_password(cur_password)
-                if not do_change:
-                    request.session['auth_attempts'] = attempts + 1
-                    messages.error(
-                        request,
-                        _('You have entered an invalid password.')
-                    )
-                    rotate_token(request)
-                else:
-                    request.session['auth_attempts'] = 0
-
-    else:
-        change_form = PasswordChangeForm()
 
-    if request.method == 'POST':
         form = SetPasswordForm(request.user, request.POST)
-        if form.is_valid() and do_change:
+        change_form = None
+        if has_password:
+            change_form = PasswordChangeForm(request.POST)
+
+        # Validate new password first as checking current one is expensive
+        if form.is_valid() and (
+                change_form is None or
+                check_current_password(request, change_form)):
 
             # Clear flag forcing user to set password
             redirect_page = '#auth'
@@ -587,6 +701,9 @@ def password(request):
             return redirect_profile(redirect_page)
     else:
         form = SetPasswordForm(request.user)
+        change_form = None
+        if has_password:
+            change_form = PasswordChangeForm()
 
     return render(
         request,
@@ -601,7 +718,7 @@ def password(request):
 
 def reset_password(request):
     """Password reset handling."""
-    if 'email' not in load_backends(BACKENDS).keys():
+    if 'email' not in get_auth_backends():
         messages.error(
             request,
             _('Can not reset password, email authentication is disabled!')
@@ -647,12 +764,8 @@ def reset_password(request):
 @login_required
 def reset_api_key(request):
     """Reset user API key"""
-    if hasattr(request.user, 'auth_token'):
-        request.user.auth_token.delete()
-    Token.objects.create(
-        user=request.user,
-        key=get_random_string(40)
-    )
+    Token.objects.filter(user=request.user).delete()
+    Token.objects.create(user=request.user)
 
     return redirect_profile('#api')
 
@@ -675,15 +788,25 @@ class SuggestionView(ListView):
     paginate_by = 25
     model = Suggestion
 
+    def get_page_user(self):
+        """Return user whose suggestions are listed."""
+        if not hasattr(self, 'page_user'):
+            self.page_user = get_object_or_404(
+                User.objects.select_related('profile'),
+                username=self.kwargs['user']
+            )
+        return self.page_user
+
     def get_queryset(self):
+        # Project and language are used when rendering every suggestion
         return Suggestion.objects.filter(
-            user=get_object_or_404(User, username=self.kwargs['user']),
-            project__in=Project.objects.all_acl(self.request.user)
-        )
+            user=self.get_page_user(),
+            project_id__in=Project.objects.get_acl_ids(self.request.user)
+        ).select_related('project', 'language')
 
     def get_context_data(self):
         result = super(SuggestionView, self).get_context_data()
-        user = get_object_or_404(User, username=self.kwargs['user'])
+        user = self.get_page_user()
         result['page_user'] = user
         result['page_profile'] = user.profile
         return result
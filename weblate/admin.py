@@ -33,13 +33,12 @@ from django.views.decorators.cache import never_cache
 from rest_framework.authtoken.admin import TokenAdmin
 from rest_framework.authtoken.models import Token
 
-from social_django.admin import (
-    UserSocialAuthOption, NonceOption, AssociationOption,
-)
+from social_django.admin import NonceOption, AssociationOption
 from social_django.models import UserSocialAuth, Nonce, Association
 
 from weblate.accounts.admin import (
     WeblateUserAdmin, WeblateGroupAdmin, ProfileAdmin, VerifiedEmailAdmin,
+    WeblateUserSocialAuthAdmin,
 )
 from weblate.accounts.forms import LoginForm
 from weblate.accounts.models import Profile, VerifiedEmail
@@ -116,7 +115,7 @@ class WeblateAdminSite(AdminSite):
             self.register(Invoice, InvoiceAdmin)
 
         # Python Social Auth
-        self.register(UserSocialAuth, UserSocialAuthOption)
+        self.register(UserSocialAuth, WeblateUserSocialAuthAdmin)
         self.register(Nonce, NonceOption)
         self.register(Association, AssociationOption)
 
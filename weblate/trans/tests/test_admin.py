@@ -21,8 +21,12 @@
 import os
 
 from django.conf import settings
+from django.contrib.auth.models import Group, User
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 
+from weblate.accounts.models import VerifiedEmail
 from weblate.trans.tests.test_views import ViewTestCase
 from weblate.trans.util import add_configuration_error
 from weblate.trans.tests.utils import get_test_file
@@ -134,3 +138,94 @@ class AdminTest(ViewTestCase):
                 }
             )
             self.assertRedirects(response, url)
+
+    def create_users(self, count=3):
+        """Create users which are members of some groups."""
+        groups = list(Group.objects.all()[:2])
+        users = []
+        start = User.objects.count()
+        for i in range(start, start + count):
+            user = User.objects.create_user(
+                'user{0}'.format(i),
+                'user{0}@example.com'.format(i),
+            )
+            user.groups.add(*groups)
+            users.append(user)
+        return users
+
+    def assert_listing_queries(self, url, create):
+        """Check that listing more objects does not need more queries."""
+        # Warm up caches filled on first request
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        expected = len(context)
+
+        create()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(len(context), expected)
+        return response
+
+    def test_users(self):
+        """Test for user listing with groups."""
+        response = self.assert_listing_queries(
+            reverse('admin:auth_user_changelist'),
+            self.create_users
+        )
+        self.assertContains(response, User.objects.latest('pk').email)
+
+    def create_verified_emails(self, count=3):
+        """Create verified emails for new users."""
+        for user in self.create_users(count):
+            social = user.social_auth.create(provider='email', uid=user.email)
+            VerifiedEmail.objects.create(social=social, email=user.email)
+
+    def test_verified_emails(self):
+        """Test for verified emails listing."""
+        self.create_verified_emails(1)
+        response = self.assert_listing_queries(
+            reverse('admin:accounts_verifiedemail_changelist'),
+            self.create_verified_emails
+        )
+        self.assertContains(response, User.objects.latest('pk').email)
+
+    def test_profiles(self):
+        """Test for profiles listing."""
+        response = self.assert_listing_queries(
+            reverse('admin:accounts_profile_changelist'),
+            self.create_users
+        )
+        self.assertContains(response, User.objects.latest('pk').username)
+
+    def test_users_search(self):
+        """Test for user search by username prefix."""
+        url = reverse('admin:auth_user_changelist')
+        response = self.client.get(url, {'q': self.user.username[:3]})
+        self.assertContains(response, '1 result')
+        response = self.client.get(url, {'q': self.user.username[1:]})
+        self.assertContains(response, '0 results')
+
+    def test_social_auth_search(self):
+        """Test for social auth lookup used by verified emails."""
+        response = self.client.get(
+            reverse('admin:social_django_usersocialauth_changelist'),
+            {'q': self.user.username[:3], '_popup': '1', '_to_field': 'id'}
+        )
+        self.assertContains(response, self.user.email)
+
+    def test_social_auth_search_settings(self):
+        """Test for social auth search fields configured in settings."""
+        self.user.social_auth.create(provider='github', uid='12345')
+        url = reverse('admin:social_django_usersocialauth_changelist')
+        response = self.client.get(url, {'q': 'git'})
+        self.assertContains(response, '0 results')
+        with override_settings(SOCIAL_AUTH_ADMIN_SEARCH_FIELDS=['provider']):
+            response = self.client.get(url, {'q': 'git'})
+            self.assertContains(response, '1 result')
+        response = self.client.get(url, {'q': 'testuser'})
+        self.assertNotContains(response, '0 results')
+        with override_settings(
+                SOCIAL_AUTH_ADMIN_USER_SEARCH_FIELDS=['first_name']):
+            response = self.client.get(url, {'q': 'testuser'})
+            self.assertContains(response, '0 results')